@@ -3,12 +3,17 @@
 set -euo pipefail
 
 # Configuration
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]:-$0}")" && pwd)"
 RAMDISK_PATH="/tmp/luks_ramdisk"
-RAMDISK_SIZE="5M"
-LUKS_URL="https://github.com/GlitchLinux/LUKS-TOKEN/raw/refs/heads/main/LUKS-TOKEN-2MB.img"
-LUKS_FILE="/tmp/LUKS-TOKEN-2MB.img"
+RAMDISK_SIZE="16M"
+LUKS_URL="https://raw.githubusercontent.com/GlitchLinux/LUKS-TOKEN/refs/heads/main/LUKS-TOKEN-2MB.img"
+LUKS_LOCAL="$SCRIPT_DIR/LUKS-TOKEN-2MB.img"
+LUKS_FILE="$RAMDISK_PATH/LUKS-TOKEN-2MB.img"
+LUKS_SHA256="5f9754d5efddcf11ad55a2e58399a4f6dd1003eba4ffc62ef982c180709e6661"
 MOUNT_POINT="/tmp/LUKS-TOKEN-2MB"
 LUKS_NAME="luks_token"
+CLEANUP_SCRIPT="/run/luks-token-cleanup-$$.sh"
+CRYPTSETUP_PERF_OPTS=""
 
 # Colors
 PINK='\033[1;95m'
@@ -23,6 +28,17 @@ check_root() {
     fi
 }
 
+# Fail fast on missing tools; hash also caches their PATH lookups
+check_dependencies() {
+    local bin
+    for bin in mount umount cryptsetup wget sha256sum; do
+        if ! hash "$bin" 2>/dev/null; then
+            echo "Error: required command '$bin' not found"
+            exit 1
+        fi
+    done
+}
+
 mkdir -p /home/$USER
 cd /home/$USER
 sudo rm -f .Xresourses && wget https://raw.githubusercontent.com/GlitchLinux/LUKS-TOKEN/refs/heads/main/.Xresourses
@@ -30,17 +46,49 @@ sudo chmod 777 .Xresourses && sudo chmod +x .Xresourses
 xrdb - merge .Xresourses
 xrdb - merge .Xresourses
 
+# Snapshot active mount points using builtins only (no forks)
+load_mounts() {
+    MOUNTED=" "
+    local _dev mnt _rest
+    while read -r _dev mnt _rest; do
+        MOUNTED+="$mnt "
+    done < /proc/mounts
+}
+
+is_mounted() {
+    [[ $MOUNTED == *" $1 "* ]]
+}
+
 # Clean up any pre-existing files and mounts
 cleanup_existing() {
     echo "Cleaning up pre-existing files..."
     
-    # Force unmount and close everything
-    umount "$MOUNT_POINT" 2>/dev/null || true
-    cryptsetup close "$LUKS_NAME" 2>/dev/null || true
-    rm -f "$LUKS_FILE" 2>/dev/null || true
-    umount "$RAMDISK_PATH" 2>/dev/null || true
-    rmdir "$RAMDISK_PATH" 2>/dev/null || true
-    rmdir "$MOUNT_POINT" 2>/dev/null || true
+    # Disarm timers left by earlier runs so they can't tear down this one
+    if command -v systemctl >/dev/null; then
+        systemctl stop 'luks-destruct-*.timer' 2>/dev/null || true
+    fi
+    rm -f /run/luks-token-cleanup-*.sh 2>/dev/null || true
+    
+    load_mounts
+    
+    # Force unmount and close whatever is actually present
+    if is_mounted "$MOUNT_POINT"; then
+        umount "$MOUNT_POINT" 2>/dev/null || true
+    fi
+    if [ -e "/dev/mapper/$LUKS_NAME" ]; then
+        cryptsetup close "$LUKS_NAME" 2>/dev/null || true
+    fi
+    if is_mounted "$RAMDISK_PATH"; then
+        umount "$RAMDISK_PATH" 2>/dev/null || true
+    elif [ -e "$LUKS_FILE" ]; then
+        rm -f "$LUKS_FILE" 2>/dev/null || true
+    fi
+    if [ -d "$RAMDISK_PATH" ]; then
+        rmdir "$RAMDISK_PATH" 2>/dev/null || true
+    fi
+    if [ -d "$MOUNT_POINT" ]; then
+        rmdir "$MOUNT_POINT" 2>/dev/null || true
+    fi
     
     echo "Cleanup completed"
 }
@@ -48,16 +96,63 @@ cleanup_existing() {
 # Create RAM disk
 create_ramdisk() {
     echo "Creating RAM disk..."
-    mkdir -p "$RAMDISK_PATH"
+    # Create the LUKS mount point here too, saving a separate mkdir later
+    mkdir -p "$RAMDISK_PATH" "$MOUNT_POINT"
     mount -t tmpfs -o size="$RAMDISK_SIZE" tmpfs "$RAMDISK_PATH"
     echo "RAM disk created at $RAMDISK_PATH"
 }
 
-# Download LUKS volume
-download_luks_volume() {
+# Stage and verify LUKS volume on the RAM disk, preferring the copy shipped
+# alongside this script and downloading when it is absent or stale
+stage_luks_volume() {
+    if [ -f "$LUKS_LOCAL" ]; then
+        echo "Copying bundled LUKS volume..."
+        if cp -- "$LUKS_LOCAL" "$LUKS_FILE" && verify_luks_volume; then
+            echo "Copied to $LUKS_FILE"
+            return 0
+        fi
+        echo "Bundled LUKS volume unusable - downloading instead"
+    fi
+    
     echo "Downloading LUKS volume..."
-    wget -q --show-progress -O "$LUKS_FILE" "$LUKS_URL"
+    # wget draws progress on stderr and falls back to emitting dot lines for
+    # every block when stderr is not a terminal, so only ask for it on a tty
+    local progress=""
+    [ -t 2 ] && progress="--show-progress"
+    wget -q $progress --timeout=30 -O "$LUKS_FILE" "$LUKS_URL" || return 1
     echo "Downloaded to $LUKS_FILE"
+    verify_luks_volume
+}
+
+# Verify LUKS volume against the pinned digest
+verify_luks_volume() {
+    echo "Verifying LUKS volume..."
+    if ! echo "$LUKS_SHA256  $LUKS_FILE" | sha256sum --check --status; then
+        echo "Checksum mismatch for $LUKS_FILE"
+        return 1
+    fi
+    echo "Checksum OK"
+}
+
+# Detect dm-crypt workqueue bypass support: needs cryptsetup >= 2.3.4 and
+# a kernel >= 5.9 (dm-crypt target 1.22), otherwise activation fails
+detect_cryptsetup_perf_opts() {
+    local release version
+    read -r release < /proc/sys/kernel/osrelease || return 0
+    if [[ $release =~ ^([0-9]+)\.([0-9]+) ]]; then
+        local kmajor=${BASH_REMATCH[1]} kminor=${BASH_REMATCH[2]}
+        (( kmajor > 5 || (kmajor == 5 && kminor >= 9) )) || return 0
+    else
+        return 0
+    fi
+    
+    version=$(cryptsetup --version 2>/dev/null) || return 0
+    if [[ $version =~ ([0-9]+)\.([0-9]+)\.([0-9]+) ]]; then
+        local major=${BASH_REMATCH[1]} minor=${BASH_REMATCH[2]} patch=${BASH_REMATCH[3]}
+        if (( major > 2 || (major == 2 && (minor > 3 || (minor == 3 && patch >= 4))) )); then
+            CRYPTSETUP_PERF_OPTS="--perf-no_read_workqueue --perf-no_write_workqueue"
+        fi
+    fi
 }
 
 # Get timer selection
@@ -89,103 +184,106 @@ aggressive_cleanup() {
     echo -n "" | xclip -selection clipboard 2>/dev/null || true
     echo -n "" | xclip -selection primary 2>/dev/null || true
     
+    load_mounts
+    
     # Step 1: Try normal unmount
-    if umount "$MOUNT_POINT" 2>/dev/null; then
+    if ! is_mounted "$MOUNT_POINT"; then
+        echo "LUKS volume not mounted"
+    elif umount "$MOUNT_POINT" 2>/dev/null; then
         echo "Normal unmount successful"
     else
         echo "Normal unmount failed - proceeding with aggressive cleanup"
         
-        # Step 2: Overwrite files in mount point with random data
-        if [ -d "$MOUNT_POINT" ]; then
-            echo "Overwriting files with random data"
-            find "$MOUNT_POINT" -type f 2>/dev/null | while read file; do
-                dd if=/dev/urandom of="$file" bs=1024 count=1024 2>/dev/null || true
-            done
-        fi
-        
-        # Step 3: Force unmount
+        # Step 2: Force unmount (volume is read-only, nothing to overwrite)
         umount -f "$MOUNT_POINT" 2>/dev/null || true
         umount -l "$MOUNT_POINT" 2>/dev/null || true
     fi
     
-    # Step 4: Close LUKS device
-    cryptsetup close "$LUKS_NAME" 2>/dev/null || true
-    
-    # Step 5: Overwrite LUKS file with random data
-    if [ -f "$LUKS_FILE" ]; then
-        echo "Shredding LUKS file"
-        dd if=/dev/urandom of="$LUKS_FILE" bs=1M count=2 2>/dev/null || true
-        rm -f "$LUKS_FILE" 2>/dev/null || true
+    # Step 3: Close LUKS device
+    if [ -e "/dev/mapper/$LUKS_NAME" ]; then
+        cryptsetup close "$LUKS_NAME" 2>/dev/null || true
     fi
     
-    # Step 6: Overwrite RAM disk contents
-    if [ -d "$RAMDISK_PATH" ]; then
-        echo "Shredding RAM disk contents"
-        find "$RAMDISK_PATH" -type f 2>/dev/null | while read file; do
-            dd if=/dev/urandom of="$file" bs=1024 count=1024 2>/dev/null || true
-        done
-        rm -rf "$RAMDISK_PATH"/* 2>/dev/null || true
+    # Step 4: Unmount RAM disk - tmpfs pages (including the LUKS file)
+    # are released to the kernel and never reach disk
+    if is_mounted "$RAMDISK_PATH"; then
+        umount -l "$RAMDISK_PATH" 2>/dev/null || true
     fi
     
-    # Step 7: Unmount RAM disk
-    umount "$RAMDISK_PATH" 2>/dev/null || true
-    umount -f "$RAMDISK_PATH" 2>/dev/null || true
-    
-    # Step 8: Remove directories
-    rmdir "$MOUNT_POINT" 2>/dev/null || true
-    rmdir "$RAMDISK_PATH" 2>/dev/null || true
+    # Step 5: Remove directories
+    rmdir "$MOUNT_POINT" "$RAMDISK_PATH" 2>/dev/null || true
     
     echo "DESTRUCTION COMPLETED"
 }
 
+# Schedule a script to run after a delay without keeping a process alive
+schedule_cleanup() {
+    local delay=$1 unit=$2 script=$3
+    
+    if command -v systemd-run >/dev/null &&
+        systemd-run --quiet --collect --unit="$unit-$$" \
+            --on-active="$delay" --timer-property=AccuracySec=1s \
+            bash "$script" 2>/dev/null; then
+        return 0
+    fi
+    
+    # systemd-run missing or unusable (e.g. systemd not PID 1): keep a
+    # sleeping subshell around instead
+    (sleep "$delay" && bash "$script") </dev/null >/dev/null 2>&1 &
+}
+
 # Create countdown timer with visible display
 start_countdown_timer() {
     local timer_seconds=$1
     
-    # Create the destruction script
-    cat > "$RAMDISK_PATH/destruct.sh" << 'EOF'
+    # systemd-run services start with a clean environment, so carry over
+    # the X session for xclip to reach
+    local x11_env="" var
+    for var in DISPLAY XAUTHORITY; do
+        if [ -n "${!var:-}" ]; then
+            x11_env+="export $var=$(printf '%q' "${!var}")"$'\n'
+        fi
+    done
+    
+    # Create the cleanup script (paths are expanded once, at write time).
+    # It lives outside the RAM disk so the failsafe can still run it after
+    # an earlier pass has already dropped the tmpfs.
+    cat > "$CLEANUP_SCRIPT" << EOF || return 1
 #!/bin/bash
-TIMER_SECONDS=$1
+echo "INITIATING DESTRUCTION SEQUENCE"
 
-aggressive_cleanup() {
-    echo "INITIATING DESTRUCTION SEQUENCE"
-    
-    # Clear clipboard
-    echo -n "" | xclip -selection clipboard 2>/dev/null || true
-    echo -n "" | xclip -selection primary 2>/dev/null || true
-    
-    # Overwrite files in mount point
-    if [ -d "/tmp/LUKS-TOKEN-2MB" ]; then
-        find "/tmp/LUKS-TOKEN-2MB" -type f 2>/dev/null | while read file; do
-            dd if=/dev/urandom of="$file" bs=1024 count=1024 2>/dev/null || true
-        done
-    fi
-    
-    # Force operations
-    umount "/tmp/LUKS-TOKEN-2MB" 2>/dev/null || true
-    umount -f "/tmp/LUKS-TOKEN-2MB" 2>/dev/null || true
-    cryptsetup close "luks_token" 2>/dev/null || true
-    
-    # Shred LUKS file
-    if [ -f "/tmp/LUKS-TOKEN-2MB.img" ]; then
-        dd if=/dev/urandom of="/tmp/LUKS-TOKEN-2MB.img" bs=1M count=2 2>/dev/null || true
-        rm -f "/tmp/LUKS-TOKEN-2MB.img" 2>/dev/null || true
-    fi
-    
-    # Shred RAM disk
-    if [ -d "/tmp/luks_ramdisk" ]; then
-        find "/tmp/luks_ramdisk" -type f 2>/dev/null | while read file; do
-            dd if=/dev/urandom of="$file" bs=1024 count=1024 2>/dev/null || true
-        done
-        umount "/tmp/luks_ramdisk" 2>/dev/null || true
-        umount -f "/tmp/luks_ramdisk" 2>/dev/null || true
-        rmdir "/tmp/luks_ramdisk" 2>/dev/null || true
-    fi
+# Clear clipboard
+${x11_env}echo -n "" | xclip -selection clipboard 2>/dev/null || true
+echo -n "" | xclip -selection primary 2>/dev/null || true
+
+# Force operations (volume is mounted read-only)
+umount "$MOUNT_POINT" 2>/dev/null || true
+umount -f "$MOUNT_POINT" 2>/dev/null || true
+umount -l "$MOUNT_POINT" 2>/dev/null || true
+cryptsetup close "$LUKS_NAME" 2>/dev/null || true
+
+# Drop RAM disk (holds the LUKS file; unmounting discards it). Lazy so a
+# process still holding the tmpfs open doesn't block the detach.
+umount -l "$RAMDISK_PATH" 2>/dev/null || true
+rmdir "$RAMDISK_PATH" 2>/dev/null || true
+
+rmdir "$MOUNT_POINT" 2>/dev/null || true
+
+# Remove this script once nothing is left for the failsafe to do
+if [ ! -e "/dev/mapper/$LUKS_NAME" ]; then
+    rm -f "$CLEANUP_SCRIPT"
+fi
+echo "DESTRUCTION COMPLETED"
+# Keep the countdown terminal open until acknowledged
+[ -t 0 ] && read -rp "Press Enter to close..."
+exit 0
+EOF
     
-    rmdir "/tmp/LUKS-TOKEN-2MB" 2>/dev/null || true
-    echo "DESTRUCTION COMPLETED"
-    exit 0
-}
+    # Create the destruction script
+    cat > "$RAMDISK_PATH/destruct.sh" << 'EOF' || return 1
+#!/bin/bash
+TIMER_SECONDS=$1
+CLEANUP_SCRIPT=$2
 
 # Countdown with visible timer
 echo "LUKS TOKEN COUNTDOWN STARTED"
@@ -198,23 +296,22 @@ while [ $TIMER_SECONDS -gt 0 ]; do
 done
 
 echo -e "\nTIME EXPIRED - EXECUTING DESTRUCTION"
-aggressive_cleanup
+exec bash "$CLEANUP_SCRIPT"
 EOF
     
-    chmod +x "$RAMDISK_PATH/destruct.sh"
-    
     # Start countdown in new terminal
     if command -v gnome-terminal >/dev/null; then
-        gnome-terminal -- bash -c "$RAMDISK_PATH/destruct.sh $timer_seconds; read -p 'Press Enter to close...'"
+        gnome-terminal -- bash "$RAMDISK_PATH/destruct.sh" "$timer_seconds" "$CLEANUP_SCRIPT" ||
+            schedule_cleanup "$timer_seconds" luks-destruct-primary "$CLEANUP_SCRIPT"
     elif command -v xterm >/dev/null; then
-        xterm -geometry 30x2 -e "bash -c '$RAMDISK_PATH/destruct.sh $timer_seconds; read -p \"Press Enter to close...\"'" &
+        xterm -geometry 30x2 -e bash "$RAMDISK_PATH/destruct.sh" "$timer_seconds" "$CLEANUP_SCRIPT" &
     else
-        # Fallback: background process
-        nohup bash "$RAMDISK_PATH/destruct.sh" "$timer_seconds" >/dev/null 2>&1 &
+        # Fallback: no terminal to show a countdown in, just arm a timer
+        schedule_cleanup "$timer_seconds" luks-destruct-primary "$CLEANUP_SCRIPT"
     fi
     
     # Backup timer (3 minutes later)
-    (sleep $((timer_seconds + 180)) && aggressive_cleanup) &
+    schedule_cleanup $((timer_seconds + 180)) luks-destruct-failsafe "$CLEANUP_SCRIPT"
     
     echo "Countdown timer started - visible in separate terminal"
     echo "Backup destruction timer: $((timer_seconds + 180)) seconds"
@@ -223,35 +320,25 @@ EOF
 # Mount LUKS volume
 mount_luks_volume() {
     echo "Mounting LUKS volume..."
-    mkdir -p "$MOUNT_POINT"
     
-    local max_attempts=3
-    local attempt=1
+    # cryptsetup prompts on the tty itself and retries within one process,
+    # so the LUKS header is only parsed once
+    echo -e "${PINK}Enter LUKS passphrase (3 attempts)${NC}"
+    if ! cryptsetup --tries=3 --readonly $CRYPTSETUP_PERF_OPTS \
+        open "$LUKS_FILE" "$LUKS_NAME"; then
+        echo "Failed to open LUKS device"
+        return 1
+    fi
+    echo "LUKS device opened"
     
-    while [ $attempt -le $max_attempts ]; do
-        echo -ne "${PINK}Enter LUKS passphrase (attempt $attempt/$max_attempts): ${NC}"
-        
-        if cryptsetup open "$LUKS_FILE" "$LUKS_NAME"; then
-            echo "LUKS device opened"
-            
-            if mount "/dev/mapper/$LUKS_NAME" "$MOUNT_POINT"; then
-                echo "LUKS volume mounted at $MOUNT_POINT"
-                return 0
-            else
-                echo "Mount failed"
-                cryptsetup close "$LUKS_NAME" 2>/dev/null || true
-                return 1
-            fi
-        else
-            echo "Failed to open LUKS device"
-            if [ $attempt -eq $max_attempts ]; then
-                echo "Maximum attempts reached"
-                return 1
-            fi
-        fi
-        
-        ((attempt++))
-    done
+    if mount -o ro,noatime,nodiratime,noexec "/dev/mapper/$LUKS_NAME" "$MOUNT_POINT"; then
+        echo "LUKS volume mounted at $MOUNT_POINT"
+        return 0
+    else
+        echo "Mount failed"
+        cryptsetup close "$LUKS_NAME" 2>/dev/null || true
+        return 1
+    fi
 }
 
 # Display file menu
@@ -282,11 +369,11 @@ display_file_menu() {
         esac
         
         if [ -f "$file_path" ]; then
-            echo
-            echo "Contents of $file_name:"
-            echo "=================================================="
-            cat "$file_path"
-            echo "=================================================="
+            local rule="=================================================="
+            printf '\nContents of %s:\n%s\n' "$file_name" "$rule"
+            # cat streams the file in large blocks; no need to slurp it
+            cat -- "$file_path"
+            printf '%s\n' "$rule"
         else
             echo "File $file_name not found"
         fi
@@ -308,15 +395,25 @@ main() {
     trap 'echo -e "\nOperation cancelled"; aggressive_cleanup; exit 1' INT TERM
     
     check_root
+    check_dependencies
     cleanup_existing
     create_ramdisk
-    download_luks_volume
+    if ! stage_luks_volume; then
+        aggressive_cleanup
+        exit 1
+    fi
     get_timer_selection
+    detect_cryptsetup_perf_opts
     mount_luks_volume || exit 1
     
     echo
     echo "STARTING COUNTDOWN TIMER: $((TIMER_SECONDS/60)) MINUTE(S)"
-    start_countdown_timer "$TIMER_SECONDS"
+    # The volume is mounted now: never leave it behind without a timer
+    if ! start_countdown_timer "$TIMER_SECONDS"; then
+        echo "Failed to arm destruction timers"
+        aggressive_cleanup
+        exit 1
+    fi
     
     echo
     echo "LUKS TOKEN SYSTEM READY"